@@ -5,7 +5,69 @@ Credential-aware optimizer that matches users to call types they can actually do
 from src.call_optimizer import CallScheduleOptimizer
 from src.api_client import SpinSchedulesAPIClient
 from src.constraint_validator import SchedulingConstraints
-from typing import Dict, List, Set
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+import logging
+import sys
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Map credential groups to call types. Keys are interned, as are the group
+# names read from API responses, so matches short-circuit on identity.
+_CREDENTIAL_MAPPING: Dict[str, Tuple[str, ...]] = {sys.intern(name): call_types for name, call_types in {
+    'Cred Call: CMCG Call Pool': ('CMCG',),
+    'Cred Call: CMCO Call Pool': ('CMCO',),
+    'Cred Call: LPH Call Pool': ('LP7', 'LPG', 'LPO'),
+    'Cred Call: MCL Call Pool': ('MCL7', 'MCLG', 'MCLO'),
+    'Cred Call: MCK Call Pool': ('MCKC_N', 'MCKT_D', 'MCKG_D'),
+    'Cred Call: THDN Call Pool': ('THDN7', 'THDNG', 'THDNO'),
+    'Cred Call: NE Call Pool': ('NE',),
+    'Cred Call: PHR Call Pool': ('PHR7', 'PHRG', 'PHRO'),
+}.items()}
+
+# Group names that grant any call credential
+_CRED_GROUP_NAMES: FrozenSet[str] = frozenset(_CREDENTIAL_MAPPING)
+
+# Every call type a credential can grant, in mapping order
+_CALL_TYPES: Tuple[str, ...] = tuple(dict.fromkeys(chain.from_iterable(_CREDENTIAL_MAPPING.values())))
+
+# Per-user credential cache: user_id -> (fetch time, credentials)
+CREDENTIAL_CACHE_TTL = 300  # seconds
+CREDENTIAL_CACHE_MAXSIZE = 4096
+_credential_cache: Dict[int, Tuple[float, FrozenSet[str]]] = {}
+_credential_cache_lock = threading.Lock()
+
+
+def clear_credential_cache() -> None:
+    """Drop all cached credentials (call after changing user-group membership)"""
+    with _credential_cache_lock:
+        _credential_cache.clear()
+
+
+def credentials_from_groups(user_groups: List[Dict]) -> Set[str]:
+    """
+    Map a user's group memberships to the call types they are credentialed for
+    
+    Args:
+        user_groups: Group dictionaries for a single user
+        
+    Returns:
+        Set of call types the user can take (e.g., {'CMCG', 'CMCO'})
+    """
+    credentials = set()
+    
+    # Check which credential groups the user belongs to
+    user_group_names = {sys.intern(group.get('groupName') or '') for group in user_groups}
+    for group_name in user_group_names & _CRED_GROUP_NAMES:
+        credentials.update(_CREDENTIAL_MAPPING[group_name])
+    
+    return credentials
 
 
 def get_user_call_credentials(api_client: SpinSchedulesAPIClient, user_id: int) -> Set[str]:
@@ -19,10 +81,17 @@ def get_user_call_credentials(api_client: SpinSchedulesAPIClient, user_id: int)
     Returns:
         Set of call types the user can take (e.g., {'CMCG', 'CMCO'})
     """
+    with _credential_cache_lock:
+        cached = _credential_cache.get(user_id)
+    if cached and time.monotonic() - cached[0] < CREDENTIAL_CACHE_TTL:
+        return set(cached[1])
+    
     try:
         # Get user's groups
+        # Go to the API directly; the in-memory cache above already covers
+        # repeat lookups, and clear_credential_cache must force a refetch
         response = api_client._make_request(
-            'GET', 
+            'GET',
             '/External/get_users_userGroups',
             params={'userId': user_id}
         )
@@ -30,93 +99,131 @@ def get_user_call_credentials(api_client: SpinSchedulesAPIClient, user_id: int)
         if not response.get('success'):
             return set()
         
-        user_groups = response.get('groups', [])
-        credentials = set()
+        credentials = credentials_from_groups(response.get('groups', []))
         
-        # Map credential groups to call types
-        credential_mapping = {
-            'Cred Call: CMCG Call Pool': ['CMCG'],
-            'Cred Call: CMCO Call Pool': ['CMCO'],
-            'Cred Call: LPH Call Pool': ['LP7', 'LPG', 'LPO'],
-            'Cred Call: MCL Call Pool': ['MCL7', 'MCLG', 'MCLO'],
-            'Cred Call: MCK Call Pool': ['MCKC_N', 'MCKT_D', 'MCKG_D'],
-            'Cred Call: THDN Call Pool': ['THDN7', 'THDNG', 'THDNO'],
-            'Cred Call: NE Call Pool': ['NE'],
-            'Cred Call: PHR Call Pool': ['PHR7', 'PHRG', 'PHRO'],
-        }
-        
-        # Check which credential groups the user belongs to
-        for group in user_groups:
-            group_name = group.get('groupName', '')
-            if group_name in credential_mapping:
-                credentials.update(credential_mapping[group_name])
+        with _credential_cache_lock:
+            _credential_cache.pop(user_id, None)
+            if len(_credential_cache) >= CREDENTIAL_CACHE_MAXSIZE:
+                # Evict the oldest entry (dicts keep insertion order)
+                _credential_cache.pop(next(iter(_credential_cache)))
+            _credential_cache[user_id] = (time.monotonic(), frozenset(credentials))
         
         return credentials
         
-    except Exception as e:
-        print(f"Error getting credentials for user {user_id}: {e}")
+    except Exception:
+        logger.exception("Error getting credentials for user %s", user_id)
         return set()
 
 
-def get_credentialed_users_by_call_type(api_client: SpinSchedulesAPIClient) -> Dict[str, List[int]]:
+def get_credentialed_users_by_call_type(api_client: SpinSchedulesAPIClient,
+                                        max_workers: int = 16,
+                                        limit: Optional[int] = None) -> Dict[str, np.ndarray]:
     """
     Get users organized by the call types they can handle
     
+    Args:
+        api_client: API client instance
+        max_workers: Maximum concurrent per-user lookups when the bulk
+            group endpoint is unavailable
+        limit: Only check the first `limit` users of the roster (all if None)
+        
     Returns:
-        Dictionary mapping call_type -> list of user_ids who can do that call type
+        Dictionary mapping call_type -> int64 array of user_ids who can do that
+        call type, ready for vectorized constraint checks
     """
-    print("Loading user credentials...")
-    
-    # Get all users
-    all_users = api_client.get_user_roster()
+    logger.info("Loading user credentials...")
     
     # Get employment groups to filter to relevant users
     employment_groups = {1000, 1020, 11327, 1030}  # Full Time, Part Time, etc.
     
-    call_type_users = {
-        'CMCG': [], 'CMCO': [], 
-        'LP7': [], 'LPG': [], 'LPO': [],
-        'MCL7': [], 'MCLG': [], 'MCLO': [],
-        'MCKC_N': [], 'MCKT_D': [], 'MCKG_D': [],
-        'THDN7': [], 'THDNG': [], 'THDNO': [],
-        'NE': [],
-        'PHR7': [], 'PHRG': [], 'PHRO': []
-    }
-    
-    for user in all_users[:20]:  # Limit to first 20 users for testing
-        user_id = int(user['userid'])
-        
-        # Check if user is in employment groups (simplified for now)
-        # In production, you'd check group membership properly
-        
-        # Get credentials for this user
-        credentials = get_user_call_credentials(api_client, user_id)
+    call_type_users = {call_type: [] for call_type in _CALL_TYPES}
+    
+    # Fetch every user's group memberships in one request where the API
+    # supports it, rather than issuing one request per user
+    groups_by_user = api_client.get_groups_by_user()
+    
+    # Collect employment group members once so credentials are only looked
+    # up for users who can actually be scheduled
+    employed_user_ids = set()
+    for group_id in employment_groups:
+        try:
+            employed_user_ids.update(
+                int(row['userId'])
+                for row in api_client.get_user_groups(group_id=group_id)
+                if 'userId' in row
+            )
+        except Exception as e:
+            logger.warning("Could not load members of employment group %s: %s", group_id, e)
+    
+    if not employed_user_ids:
+        logger.warning("No employment group members found, checking all users")
+    
+    # Use the full roster fetch (memoized and disk-cached) until the roster
+    # endpoint is confirmed to page; get_user_roster_paged streams it
+    roster = islice(
+        (user for user in api_client.get_user_roster()
+         if not employed_user_ids or user['userid'] in employed_user_ids),
+        limit
+    )
+    
+    # Collect per-user report lines and log them in one go after the loop;
+    # skip formatting them entirely when INFO is disabled
+    report_users = logger.isEnabledFor(logging.INFO)
+    lines: List[str] = []
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Get credentials for each user
+        if groups_by_user:
+            user_credentials = (
+                (user, credentials_from_groups(groups_by_user[user['userid']]))
+                for user in roster
+            )
+        else:
+            # Per-user lookups are network-bound, so overlap their round trips
+            user_credentials = executor.map(
+                lambda user: (user, get_user_call_credentials(api_client, user['userid'])),
+                roster
+            )
         
-        if credentials:
-            user_name = f"{user.get('fname', '')} {user.get('lname', '')}"
-            print(f"  User {user_name}: {sorted(credentials)}")
+        for user, credentials in user_credentials:
+            user_id = user['userid']
             
-            # Add user to appropriate call type lists
-            for call_type in credentials:
-                if call_type in call_type_users:
+            if credentials:
+                if report_users:
+                    user_name = f"{user.get('fname', '')} {user.get('lname', '')}"
+                    lines.append(f"  User {user_name}: {sorted(credentials)}")
+                
+                # Add user to appropriate call type lists
+                for call_type in credentials:
                     call_type_users[call_type].append(user_id)
     
+    if lines:
+        logger.info("%s", '\n'.join(lines))
+    
     # Show summary
-    print(f"\nCredential summary:")
+    logger.info("\nCredential summary:")
     for call_type, users in call_type_users.items():
         if users:
-            print(f"  {call_type}: {len(users)} users")
+            logger.info("  %s: %d users", call_type, len(users))
     
-    return call_type_users
+    return {call_type: np.asarray(users, dtype=np.int64)
+            for call_type, users in call_type_users.items()}
 
 
-def test_credential_aware_optimizer():
-    """Test the optimizer with proper credential matching"""
+def test_credential_aware_optimizer(refresh: bool = False):
+    """
+    Test the optimizer with proper credential matching
+    
+    Args:
+        refresh: Discard cached API responses before loading data
+    """
     
     client = SpinSchedulesAPIClient()
+    if refresh:
+        client.clear_cache()
     
     # Get users organized by credentials
-    credentialed_users = get_credentialed_users_by_call_type(client)
+    credentialed_users = get_credentialed_users_by_call_type(client, limit=20)
     
     # Find a call type with enough users for testing
     viable_call_types = []
@@ -130,7 +237,7 @@ def test_credential_aware_optimizer():
     
     # Pick the first viable call type for testing
     test_call_type = viable_call_types[0]
-    test_users = credentialed_users[test_call_type][:5]  # Use first 5 users
+    test_users = credentialed_users[test_call_type][:5].tolist()  # Use first 5 users
     
     print(f"\nTesting with call type: {test_call_type}")
     print(f"Using {len(test_users)} credentialed users")
@@ -181,4 +288,10 @@ def test_credential_aware_optimizer():
 
 
 if __name__ == "__main__":
-    test_credential_aware_optimizer()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--refresh', action='store_true',
+                        help='Clear cached API responses before running')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    test_credential_aware_optimizer(refresh=args.refresh)
\ No newline at end of file
@@ -2,10 +2,19 @@
 Analyze SpinSchedules data to understand scheduling structure
 """
 
+import argparse
 import json
+import os
+import re
+import tempfile
+import textwrap
 from src.api_client import SpinSchedulesAPIClient
 from datetime import date, timedelta
-from collections import defaultdict
+from collections import Counter
+
+# Keywords that mark a schedule as call-related / a group as anesthesia-related
+_CALL_RE = re.compile(r'call|coverage|duty|night|weekend|holiday|emergency', re.IGNORECASE)
+_ANESTHESIA_RE = re.compile(r'anesthesi|anesth|attending|resident|fellow|crna', re.IGNORECASE)
 
 def analyze_schedules_and_groups():
     """Analyze saved schedule and group data"""
@@ -28,10 +37,7 @@ def analyze_schedules_and_groups():
     other_schedules = []
     
     for schedule in schedules:
-        name = schedule.get('name', '').lower()
-        call_keywords = ['call', 'coverage', 'duty', 'night', 'weekend', 'holiday', 'emergency']
-        
-        if any(keyword in name for keyword in call_keywords):
+        if _CALL_RE.search(schedule.get('name', '')):
             call_related.append(schedule)
         else:
             other_schedules.append(schedule)
@@ -62,11 +68,9 @@ def analyze_schedules_and_groups():
     
     # Look for anesthesia-related groups
     anesthesia_groups = []
-    anesthesia_keywords = ['anesthesi', 'anesth', 'attending', 'resident', 'fellow', 'crna']
     
     for group in user_groups:
-        name = group.get('groupName', '').lower()
-        if any(keyword in name for keyword in anesthesia_keywords):
+        if _ANESTHESIA_RE.search(group.get('groupName', '')):
             anesthesia_groups.append(group)
     
     print(f"\nPotential anesthesia-related groups: {len(anesthesia_groups)}")
@@ -77,7 +81,7 @@ def analyze_schedules_and_groups():
     return call_related, anesthesia_groups
 
 def get_current_assignments(client, schedule_ids, days_back=30):
-    """Get recent assignments to understand assignment patterns"""
+    """Get recent assignments to understand assignment patterns; returns how many were found"""
     end_date = date.today()
     start_date = end_date - timedelta(days=days_back)
     
@@ -86,50 +90,75 @@ def get_current_assignments(client, schedule_ids, days_back=30):
     
     print(f"\nGetting assignments from {start_str} to {end_str}...")
     
+    count = 0
+    assignment_codes = Counter()
+    users_with_assignments = Counter()
+    dates_with_assignments = Counter()
+    out = None
+    
     try:
-        assignments = client.get_assignments_by_schedule(
-            schedule_ids=schedule_ids,
-            start_date=start_str,
-            end_date=end_str
-        )
-        
-        print(f"Found {len(assignments)} assignments")
-        
-        # Analyze assignment patterns
-        if assignments:
-            assignment_codes = defaultdict(int)
-            users_with_assignments = defaultdict(int)
-            dates_with_assignments = defaultdict(int)
-            
-            for assignment in assignments:
+        # Consume the assignments as they are parsed, writing each one to the
+        # data file instead of holding the whole response in memory
+        try:
+            for assignment in client.iter_assignments_by_schedule(
+                schedule_ids=schedule_ids,
+                start_date=start_str,
+                end_date=end_str
+            ):
                 assignment_codes[assignment.get('aName', 'Unknown')] += 1
-                users_with_assignments[f"{assignment.get('fName', '')} {assignment.get('lName', '')}"] += 1
+                # Key on the raw name parts; only the top users get formatted
+                users_with_assignments[(assignment.get('fName', ''), assignment.get('lName', ''))] += 1
                 dates_with_assignments[assignment.get('date', '')] += 1
+                
+                # Same layout json.dump(assignments, f, indent=2) would produce;
+                # written to a temp file so a failed stream keeps the old data
+                if out is None:
+                    out = tempfile.NamedTemporaryFile('w', dir='data', suffix='.tmp',
+                                                      delete=False)
+                    out.write('[\n')
+                else:
+                    out.write(',\n')
+                out.write(textwrap.indent(json.dumps(assignment, indent=2), '  '))
+                count += 1
             
+            if out is not None:
+                out.write('\n]')
+                out.close()
+                os.replace(out.name, 'data/recent_assignments.json')
+                out = None
+        finally:
+            # Discard the partial file if the stream (or the swap) failed
+            if out is not None:
+                out.close()
+                os.unlink(out.name)
+        
+        print(f"Found {count} assignments")
+        
+        # Analyze assignment patterns
+        if count:
             print(f"\nMost common assignment types:")
-            for code, count in sorted(assignment_codes.items(), key=lambda x: x[1], reverse=True)[:5]:
-                print(f"  - {code}: {count} times")
+            for code, code_count in assignment_codes.most_common(5):
+                print(f"  - {code}: {code_count} times")
             
             print(f"\nUsers with most assignments (top 5):")
-            for user, count in sorted(users_with_assignments.items(), key=lambda x: x[1], reverse=True)[:5]:
-                print(f"  - {user}: {count} assignments")
+            for (fname, lname), user_count in users_with_assignments.most_common(5):
+                print(f"  - {fname} {lname}: {user_count} assignments")
             
-            # Save assignment data
-            with open('data/recent_assignments.json', 'w') as f:
-                json.dump(assignments, f, indent=2)
             print(f"\nAssignment data saved to data/recent_assignments.json")
         
-        return assignments
+        return count
     
     except Exception as e:
         print(f"Error getting assignments: {e}")
-        return []
+        return 0
 
-def main():
+def main(refresh=False):
     # Initialize API client
     try:
         client = SpinSchedulesAPIClient()
         print("API client initialized successfully")
+        if refresh:
+            client.clear_cache()
     except Exception as e:
         print(f"API initialization failed: {e}")
         return
@@ -144,7 +173,7 @@ def main():
     # Get user roster to test FTE data
     try:
         users = client.get_user_roster()
-        sample_user_ids = [int(user['userid']) for user in users[:5]]  # Get first 5 user IDs
+        sample_user_ids = [user['userid'] for user in users[:5]]  # Get first 5 user IDs
         
         # Test FTE data retrieval
         test_fte_data_retrieval(client, sample_user_ids)
@@ -160,7 +189,7 @@ def main():
     if call_schedules:
         schedule_ids = [schedule['id'] for schedule in call_schedules[:2]]  # Analyze first 2
         print(f"\nAnalyzing schedules: {[s['name'] for s in call_schedules[:2]]}")
-        assignments = get_current_assignments(client, schedule_ids)
+        get_current_assignments(client, schedule_ids)
     
     print("\n" + "=" * 60)
     print("ANALYSIS COMPLETE")
@@ -173,4 +202,9 @@ def main():
     print("5. Define scheduling constraints for the optimizer")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--refresh', action='store_true',
+                        help='Clear cached API responses before running')
+    args = parser.parse_args()
+    
+    main(refresh=args.refresh)
\ No newline at end of file
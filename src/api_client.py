@@ -4,30 +4,73 @@ Handles all interactions with the SpinSchedules/SpinFusion API
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
+import tempfile
+import time
+import hashlib
+import logging
+from collections import defaultdict
 from datetime import datetime, date
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Iterator, Optional, Any, Set, Tuple
 from dotenv import load_dotenv
 import json
+import ijson
+import orjson
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# How long (seconds) cached GET responses stay valid on disk
+CACHE_TTL_NORMAL = 600
+CACHE_TTL_LONG = 3600
+
 class SpinSchedulesAPIClient:
     def __init__(self):
         self.api_key = os.getenv('SPINSCHEDULES_API_KEY')
         self.base_url = os.getenv('SPINSCHEDULES_BASE_URL', 
                                   'https://www.spinfusion.com/SpinSchedulev2.0/api')
         
+        # Directory for cached GET responses (see _cached_request)
+        self.cache_dir = os.getenv('SPINSCHEDULES_CACHE_DIR', '.cache/api')
+        
+        # In-memory copies of data that rarely changes within a session
+        self._memo_ttl = 300  # seconds
+        self._roster_cache: Dict[bool, Tuple[float, List[Dict]]] = {}
+        self._schedules_cache: Optional[Tuple[float, List[Dict]]] = None
+        
         if not self.api_key:
             raise ValueError("SPINSCHEDULES_API_KEY not found in .env file")
         
+        # Stands in for the API key in cache keys without writing it to disk
+        self._cache_namespace = hashlib.sha256(self.api_key.encode()).hexdigest()
+        
         # Set up headers for all requests
         self.headers = {
             'Authorization': f'Basic {self.api_key}',
             'Content-Type': 'application/json',
             'User-Agent': 'CallScheduler-Python'  # Required for .NET integration
         }
+        
+        # Reuse keep-alive connections across requests instead of paying a
+        # TCP/TLS handshake per call; retry transient gateway errors
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=0.2,
+                              status_forcelist=[502, 503, 504])
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # Seconds to wait on connect/read so a stalled socket cannot hang a
+        # worker thread indefinitely
+        self.timeout = float(os.getenv('SPINSCHEDULES_TIMEOUT', '10'))
     
     def _make_request(self, method: str, endpoint: str, params: Dict = None, 
                      data: Any = None) -> Dict:
@@ -47,34 +90,108 @@ class SpinSchedulesAPIClient:
         
         try:
             if method.upper() == 'GET':
-                response = requests.get(url, headers=self.headers, params=params)
+                response = self.session.get(url, params=params, timeout=self.timeout)
             elif method.upper() == 'POST':
                 if isinstance(data, dict):
-                    response = requests.post(url, headers=self.headers, 
-                                           params=params, json=data)
+                    response = self.session.post(url, params=params, json=data,
+                                                 timeout=self.timeout)
                 else:
-                    response = requests.post(url, headers=self.headers, 
-                                           params=params, data=data)
+                    response = self.session.post(url, params=params, data=data,
+                                                 timeout=self.timeout)
             elif method.upper() == 'DELETE':
-                response = requests.delete(url, headers=self.headers, params=params)
+                response = self.session.delete(url, params=params, timeout=self.timeout)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
             response.raise_for_status()
             
-            # Handle empty responses
-            if not response.text:
+            # Handle empty responses; check the raw bytes so requests never
+            # has to guess a text encoding for a body orjson parses directly
+            body = response.content
+            if not body:
                 return {"success": True}
                 
-            return response.json()
+            return orjson.loads(body)
             
         except requests.exceptions.RequestException as e:
-            print(f"API request failed: {e}")
+            logger.error("API request failed: %s", e)
             if hasattr(e, 'response') and e.response is not None:
-                print(f"Response status: {e.response.status_code}")
-                print(f"Response text: {e.response.text}")
+                logger.error("Response status: %s", e.response.status_code)
+                logger.error("Response text: %s", e.response.text)
             raise
     
+    def _cached_request(self, endpoint: str, params: Dict = None,
+                        ttl: int = CACHE_TTL_NORMAL) -> Dict:
+        """
+        Make a GET request, reusing a response cached on disk if still fresh
+        
+        Args:
+            endpoint: API endpoint (without base URL)
+            params: Query parameters
+            ttl: Maximum age in seconds of a cached response
+        
+        Returns:
+            JSON response as dictionary
+        """
+        # Key on the server and credentials too, so clients pointed at
+        # another base URL or account never read each other's responses
+        key = json.dumps([self.base_url, self._cache_namespace, endpoint, params or {}],
+                         sort_keys=True, default=str)
+        cache_path = os.path.join(self.cache_dir,
+                                  hashlib.sha1(key.encode()).hexdigest() + '.json')
+        
+        try:
+            if time.time() - os.path.getmtime(cache_path) < ttl:
+                with open(cache_path, 'rb') as f:
+                    return orjson.loads(f.read())
+        except (OSError, ValueError):
+            pass  # Missing, stale or unreadable; fetch fresh
+        
+        response = self._make_request('GET', endpoint, params=params)
+        
+        # Only cache successful responses; write atomically so concurrent
+        # readers never see a partial file
+        if response.get('success'):
+            tmp_path = None
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with tempfile.NamedTemporaryFile('wb', dir=self.cache_dir,
+                                                 suffix='.tmp', delete=False) as f:
+                    tmp_path = f.name
+                    f.write(orjson.dumps(response))
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                logger.warning("Could not write API cache: %s", e)
+                if tmp_path is not None:
+                    try:
+                        os.unlink(tmp_path)
+                    except OSError:
+                        pass
+        
+        return response
+    
+    def clear_cache(self):
+        """
+        Remove all cached API responses, in memory and on disk
+        
+        Only the files _cached_request writes are deleted, so pointing
+        SPINSCHEDULES_CACHE_DIR at a shared directory is safe.
+        """
+        self._roster_cache.clear()
+        self._schedules_cache = None
+        
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return  # Nothing cached yet
+        
+        for name in names:
+            if name.endswith(('.json', '.tmp')):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+    
     # ==================== USER MANAGEMENT ====================
     
     def get_user_roster(self, include_inactive: bool = False) -> List[Dict]:
@@ -85,15 +202,76 @@ class SpinSchedulesAPIClient:
             include_inactive: Include terminated/inactive users
             
         Returns:
-            List of user dictionaries with basic info
+            List of user dictionaries with basic info ('userid' as int)
         """
+        cached = self._roster_cache.get(include_inactive)
+        if cached and time.monotonic() - cached[0] < self._memo_ttl:
+            return list(cached[1])
+        
         params = {'includeInactive': str(include_inactive).lower()}
-        response = self._make_request('GET', '/External/get_users_roster', params=params)
+        response = self._cached_request('/External/get_users_roster', params=params)
         
         if response.get('success'):
-            return response.get('users', [])
+            users = [self._normalize_user(user) for user in response.get('users', [])]
+            self._roster_cache[include_inactive] = (time.monotonic(), users)
+            return list(users)
         return []
     
+    def get_user_roster_paged(self, include_inactive: bool = False,
+                              page_size: int = 500) -> Iterator[Dict]:
+        """
+        Iterate over all users, fetching the roster one page at a time
+        
+        Args:
+            include_inactive: Include terminated/inactive users
+            page_size: Number of users requested per page
+            
+        Yields:
+            User dictionaries with basic info ('userid' as int), each user once
+            
+        The roster endpoint is not documented to honor offset/limit. If a
+        page repeats users already yielded, the server is not paging, so the
+        rest of the users come from one unpaged get_user_roster() fetch.
+        """
+        seen: Set[int] = set()
+        offset = 0
+        while True:
+            params = {
+                'includeInactive': str(include_inactive).lower(),
+                'offset': offset,
+                'limit': page_size
+            }
+            response = self._cached_request('/External/get_users_roster', params=params)
+            if not response.get('success'):
+                return
+            
+            users = [self._normalize_user(user) for user in response.get('users', [])]
+            if not users:
+                return
+            
+            # A server that ignores offset hands back a page we have already
+            # seen; fall back to the full roster instead of stopping short
+            new_users = [user for user in users if user['userid'] not in seen]
+            if users[0]['userid'] in seen or not new_users:
+                logger.warning("Roster endpoint ignored offset %d; fetching the full roster",
+                               offset)
+                yield from (user for user in self.get_user_roster(include_inactive)
+                            if user['userid'] not in seen)
+                return
+            seen.update(user['userid'] for user in new_users)
+            yield from new_users
+            
+            # A short page is the last one; an oversized page means the
+            # server ignored paging and already returned everyone
+            if len(users) != page_size:
+                return
+            offset += page_size
+    
+    @staticmethod
+    def _normalize_user(user: Dict) -> Dict:
+        """Copy a roster entry with its 'userid' converted from the API's string to int"""
+        return {**user, 'userid': int(user['userid'])}
+    
     def get_user_groups(self, user_id: int = None, group_id: int = None) -> List[Dict]:
         """
         Get user group information
@@ -117,6 +295,38 @@ class SpinSchedulesAPIClient:
             return response.get('groups', [])
         return []
     
+    def get_all_user_groups(self) -> List[Dict]:
+        """
+        Get group membership rows for all users in a single request
+
+        Returns:
+            List of group dictionaries; membership rows carry a 'userId' key
+        """
+        response = self._cached_request('/External/get_users_userGroups')
+
+        if response.get('success'):
+            return response.get('groups', [])
+        return []
+    
+    def get_groups_by_user(self) -> Dict[int, List[Dict]]:
+        """
+        Get every user's group memberships from the bulk groups request
+        
+        Returns:
+            Dictionary mapping user_id to that user's group dictionaries.
+            Empty when the request fails or only returns group definitions
+            (rows without 'userId'); callers then look users up one by one.
+        """
+        groups_by_user: Dict[int, List[Dict]] = defaultdict(list)
+        try:
+            for row in self.get_all_user_groups():
+                if 'userId' in row:
+                    groups_by_user[int(row['userId'])].append(row)
+        except Exception as e:
+            logger.warning("Bulk group lookup failed: %s", e)
+            return {}
+        return dict(groups_by_user)
+
     # ==================== SCHEDULE MANAGEMENT ====================
     
     def get_available_schedules(self) -> List[Dict]:
@@ -126,10 +336,17 @@ class SpinSchedulesAPIClient:
         Returns:
             List of schedule dictionaries with id and name
         """
-        response = self._make_request('GET', '/External/get_system_schedulesForSystem')
+        cached = self._schedules_cache
+        if cached and time.monotonic() - cached[0] < self._memo_ttl:
+            return list(cached[1])
+        
+        response = self._cached_request('/External/get_system_schedulesForSystem',
+                                        ttl=CACHE_TTL_LONG)
         
         if response.get('success'):
-            return response.get('schedules', [])
+            schedules = response.get('schedules', [])
+            self._schedules_cache = (time.monotonic(), schedules)
+            return list(schedules)
         return []
     
     def get_assignments_by_schedule(self, schedule_ids: List[int], 
@@ -147,20 +364,51 @@ class SpinSchedulesAPIClient:
         Returns:
             List of assignment dictionaries
         """
+        params = self._assignments_params(schedule_ids, start_date, end_date, use_snapshot)
+        
+        response = self._make_request('GET', '/External/get_schedules_assignmentsBySchedule', 
+                                    params=params)
+        
+        return response.get('assignments', [])
+    
+    def iter_assignments_by_schedule(self, schedule_ids: List[int],
+                                     start_date: str, end_date: str,
+                                     use_snapshot: bool = False) -> Iterator[Dict]:
+        """
+        Stream assignments for specific schedules in date range
+        
+        Parses the response incrementally, so large date ranges never hold
+        the whole payload in memory. Takes the same arguments as
+        get_assignments_by_schedule.
+        
+        Yields:
+            Assignment dictionaries
+        """
+        params = self._assignments_params(schedule_ids, start_date, end_date, use_snapshot)
+        url = f"{self.base_url}/External/get_schedules_assignmentsBySchedule"
+        
+        try:
+            with self.session.get(url, params=params, stream=True,
+                                  timeout=self.timeout) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True  # Undo gzip transfer encoding
+                yield from ijson.items(response.raw, 'assignments.item', use_float=True)
+        except requests.exceptions.RequestException as e:
+            logger.error("API request failed: %s", e)
+            raise
+    
+    def _assignments_params(self, schedule_ids: List[int], start_date: str,
+                            end_date: str, use_snapshot: bool) -> Dict:
+        """Build query parameters for the assignments-by-schedule endpoint"""
         # Convert schedule_ids to comma-separated string
         schedule_ids_str = ','.join(map(str, schedule_ids))
         
-        params = {
+        return {
             'scheduleIds': schedule_ids_str,
             'startDate': start_date,
             'endDate': end_date,
             'useSnapshotData': str(use_snapshot).lower()
         }
-        
-        response = self._make_request('GET', '/External/get_schedules_assignmentsBySchedule', 
-                                    params=params)
-        
-        return response.get('assignments', [])
     
     def get_assign_codes_in_range(self, schedule_ids: List[int], 
                                  start_date: str, end_date: str) -> List[List]:
@@ -175,15 +423,14 @@ class SpinSchedulesAPIClient:
         Returns:
             List of [assignCodeName, assignCodeId] pairs
         """
+        # Send all schedule IDs as one comma-separated value, matching
+        # get_assignments_by_schedule
         params = {
+            'scheduleIds': ','.join(map(str, schedule_ids)),
             'startDate': start_date,
             'endDate': end_date
         }
         
-        # Add multiple schedule IDs
-        for schedule_id in schedule_ids:
-            params[f'scheduleIds'] = schedule_id
-            
         response = self._make_request('GET', 
                                     '/External/get_schedules_assignCodesInUseInDateRange',
                                     params=params)
@@ -8,11 +8,32 @@ from datetime import date, timedelta
 from typing import Dict, List, Tuple, Optional, Set
 from dataclasses import dataclass
 import json
+import logging
+import os
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 
 from src.api_client import SpinSchedulesAPIClient
 from src.constraint_validator import ConstraintValidator, SchedulingConstraints
-from src.weekend_rules_engine import WeekendRulesEngine
+from src.weekend_rules_engine import get_weekend_rules_engine
+
+logger = logging.getLogger(__name__)
+
+# date.weekday() of the day a weekend rule assigns its result call on
+_RESULT_DAY_WEEKDAY = {'saturday': 5, 'sunday': 6}
+
+
+def _literals(variables) -> List:
+    """Drop the constant-0 placeholders left for unavailable user/days"""
+    return [var for var in variables if not isinstance(var, int)]
+
+
+def _add_equality(model, left, right):
+    """Post left == right where either side may be the constant 0"""
+    if not (isinstance(left, int) and isinstance(right, int)):
+        model.Add(left == right)
 
 
 @dataclass
@@ -28,10 +49,21 @@ class ScheduleResult:
 class CallScheduleOptimizer:
     """OR-Tools based call schedule optimizer"""
     
-    def __init__(self, api_client: SpinSchedulesAPIClient):
+    def __init__(self, api_client: SpinSchedulesAPIClient, debug_solver: bool = False,
+                 max_workers: int = 16):
         self.api_client = api_client
+        
+        # Maximum concurrent per-user credential lookups when the bulk group
+        # endpoint is unavailable
+        self.max_workers = max_workers
+        
+        # When set, CP-SAT logs its presolve and search progress to stdout and
+        # the log lines of the last solve are kept in solver_log
+        self.debug_solver = debug_solver
+        self.solver_log: List[str] = []
         self.constraint_validator = ConstraintValidator(api_client)
-        self.weekend_rules = WeekendRulesEngine()
+        self.weekend_rules = get_weekend_rules_engine()
+        self._name_cache: Dict[int, str] = {}
         
         # Core schedule IDs from your system
         self.CALL_SCHEDULE_ID = 383
@@ -42,6 +74,18 @@ class CallScheduleOptimizer:
         # Employment group IDs
         self.EMPLOYMENT_GROUPS = [1000, 1020, 11327, 1030]  # Full Time, Part Time, Part Time + Self Select, PRN
         
+        # Short-lived caches so repeated runs skip identical API lookups;
+        # clear_cache() drops them together with the client's caches
+        self._lookup_ttl = 300  # seconds
+        self._eligible_users_cache: Optional[Tuple[float, List[int]]] = None
+        self._call_type_mapping_cache: Dict[Tuple[str, str], Tuple[float, Dict[str, int]]] = {}
+    
+    def clear_cache(self):
+        """Forget cached eligible users and call type mappings, and the API client's caches"""
+        self._eligible_users_cache = None
+        self._call_type_mapping_cache.clear()
+        self.api_client.clear_cache()
+        
     def optimize_schedule(self, start_date: str, end_date: str, 
                          call_types: List[str] = None,
                          constraints: SchedulingConstraints = None) -> ScheduleResult:
@@ -57,7 +101,7 @@ class CallScheduleOptimizer:
         Returns:
             ScheduleResult with assignments and statistics
         """
-        print(f"Optimizing call schedule from {start_date} to {end_date}")
+        logger.info("Optimizing call schedule from %s to %s", start_date, end_date)
         
         # Set default call types if none provided
         if call_types is None:
@@ -72,7 +116,18 @@ class CallScheduleOptimizer:
         if not eligible_users:
             return ScheduleResult(False, [], {}, ["No eligible users found"], 0.0)
             
-        print(f"Found {len(eligible_users)} eligible physicians")
+        logger.info("Found %d eligible physicians", len(eligible_users))
+        
+        # Build the user name lookup once for result extraction
+        try:
+            roster = self.api_client.get_user_roster(include_inactive=False)
+            self._name_cache = {
+                user['userid']: f"{user.get('fname', '')} {user.get('lname', '')}"
+                for user in roster
+            }
+        except Exception as e:
+            logger.warning("Error loading user names: %s", e)
+            self._name_cache = {}
         
         # Load user availabilities and constraints
         user_availabilities = self.constraint_validator.load_user_availabilities(
@@ -84,125 +139,195 @@ class CallScheduleOptimizer:
         
         # Generate date range
         dates = self._generate_date_range(start_date, end_date)
+        U, D, C = len(eligible_users), len(dates), len(call_types)
+        date_ords = [date_obj.toordinal() for date_obj in dates]
+        blocked_ords = self._blocked_date_ordinals(user_availabilities)
+        
+        # Each call type needs its own user every day, so a day with fewer
+        # available users than call types can never be covered
+        violations = []
+        for date_obj, date_ord in zip(dates, date_ords):
+            available_users = sum(
+                1 for user_id in eligible_users
+                if date_ord not in blocked_ords.get(user_id, frozenset())
+            )
+            if available_users < C:
+                violations.append(
+                    f"Day {date_obj}: only {available_users} users for {C} call types"
+                )
+        if violations:
+            logger.warning("No solution possible: %d days cannot be covered", len(violations))
+            return ScheduleResult(False, [], {}, violations, 0.0)
         
         # Create optimization model
         model = cp_model.CpModel()
         
-        # Decision variables: assignment[user_id][date][call_type] = 1 if assigned
-        assignments = {}
+        # Decision variables: flat list indexed by (u * D + d) * C + c,
+        # 1 if eligible_users[u] takes call_types[c] on dates[d]. Days a user
+        # is unavailable (vacation, no-call requests) get the constant 0
+        # instead of a variable.
+        assignments = []
         for user_id in eligible_users:
-            assignments[user_id] = {}
-            for date_obj in dates:
-                assignments[user_id][date_obj] = {}
-                for call_type in call_types:
-                    assignments[user_id][date_obj][call_type] = model.NewBoolVar(
-                        f'assign_{user_id}_{date_obj}_{call_type}'
+            user_blocked = blocked_ords.get(user_id, frozenset())
+            for date_obj, date_ord in zip(dates, date_ords):
+                if date_ord in user_blocked:
+                    assignments.extend([0] * C)
+                else:
+                    assignments.extend(
+                        model.NewBoolVar(f'assign_{user_id}_{date_obj}_{call_type}')
+                        for call_type in call_types
                     )
         
         # Constraint 1: Each call type must be covered exactly once per day
-        for date_obj in dates:
-            for call_type in call_types:
-                model.Add(
-                    sum(assignments[user_id][date_obj][call_type] 
-                        for user_id in eligible_users) == 1
-                )
+        for d in range(D):
+            for c in range(C):
+                model.AddExactlyOne(_literals(assignments[d * C + c::D * C]))
         
         # Constraint 2: No user can have multiple assignments on same day
-        for user_id in eligible_users:
-            for date_obj in dates:
-                model.Add(
-                    sum(assignments[user_id][date_obj][call_type] 
-                        for call_type in call_types) <= 1
-                )
+        for u in range(U):
+            for d in range(D):
+                start = (u * D + d) * C
+                model.AddAtMostOne(_literals(assignments[start:start + C]))
         
-        # Constraint 3: Respect availability (vacation, no-call requests)
-        for user_id in eligible_users:
-            user_avail = user_availabilities.get(user_id)
-            if user_avail:
-                for date_obj in dates:
-                    if (date_obj in user_avail.vacation_dates or 
-                        date_obj in user_avail.no_call_dates):
-                        # User not available on this date
-                        for call_type in call_types:
-                            model.Add(assignments[user_id][date_obj][call_type] == 0)
+        # Weekend sandwich pairs as (trigger day, trigger call, weekend day,
+        # weekend call) indexes; the weekend half is the same commitment as
+        # its trigger, so the spacing rule below treats the two as one block
+        weekend_pairs = self._weekend_pair_slots(dates, call_types)
+        weekend_slots = {d * C + c for _, _, d, c in weekend_pairs}
         
         # Constraint 4: Minimum days between calls
-        if constraints.min_days_between_calls > 0:
-            for user_id in eligible_users:
-                for i, date_obj in enumerate(dates[:-constraints.min_days_between_calls]):
-                    # If assigned on date_obj, cannot be assigned for next min_days_between_calls days
-                    for j in range(1, constraints.min_days_between_calls + 1):
-                        if i + j < len(dates):
-                            future_date = dates[i + j]
-                            for call_type1 in call_types:
-                                for call_type2 in call_types:
-                                    model.AddImplication(
-                                        assignments[user_id][date_obj][call_type1],
-                                        assignments[user_id][future_date][call_type2].Not()
-                                    )
+        # At most one call in any window of k + 1 consecutive days, not
+        # counting weekend halves of a sandwich; those instead start a window
+        # of their own so the user still rests k days after the weekend
+        k = constraints.min_days_between_calls
+        if k > 0:
+            for u, user_id in enumerate(eligible_users):
+                base = u * D * C
+                for i in range(max(1, D - k)):
+                    model.AddAtMostOne(_literals(
+                        assignments[base + j] for j in range(i * C, min(i + k + 1, D) * C)
+                        if j not in weekend_slots
+                    ))
+                for d, c in sorted({(d, c) for _, _, d, c in weekend_pairs}):
+                    model.AddAtMostOne(_literals(chain(
+                        (assignments[base + d * C + c],),
+                        (assignments[base + j] for j in range((d + 1) * C, min(d + k + 1, D) * C)
+                         if j not in weekend_slots)
+                    )))
+                
+                # Optional redundant global view of the same rule: each call
+                # occupies an interval of k + 1 days starting on its date, and
+                # a user's intervals may not overlap
+                if constraints.use_no_overlap_spacing:
+                    intervals = []
+                    for d in range(D):
+                        start = (u * D + d) * C
+                        for c, var in enumerate(assignments[start:start + C]):
+                            if not isinstance(var, int) and d * C + c not in weekend_slots:
+                                intervals.append(model.NewOptionalFixedSizeIntervalVar(
+                                    d, k + 1, var, f'iv_{user_id}_{d}_{c}'
+                                ))
+                    model.AddNoOverlap(intervals)
         
         # Constraint 5: Weekend sandwich rules
-        self._add_weekend_sandwich_constraints(model, assignments, dates, call_types, eligible_users)
+        self._add_weekend_sandwich_constraints(model, assignments, D, C, eligible_users,
+                                               weekend_pairs)
+        
+        # Total calls per user, built once as flat linear expressions and
+        # shared by the FTE caps and the fairness objective
+        total_assignments_per_user = {}
+        for u, user_id in enumerate(eligible_users):
+            total_assignments_per_user[user_id] = cp_model.LinearExpr.Sum(
+                _literals(assignments[u * D * C:(u + 1) * D * C])
+            )
         
         # Constraint 6: FTE-based maximum calls per period
-        self._add_fte_based_constraints(model, assignments, dates, call_types, 
-                                       eligible_users, user_availabilities, constraints)
+        max_calls = self._add_fte_based_constraints(model, total_assignments_per_user, dates, call_types, 
+                                                    eligible_users, user_availabilities, constraints)
         
         # Objective: Minimize variance in call distribution (fairness)
-        total_assignments_per_user = {}
+        # Break symmetry: users with the same FTE and the same blocked dates
+        # are interchangeable, so order their totals within each class
+        equivalence_classes = defaultdict(list)
         for user_id in eligible_users:
-            total_assignments_per_user[user_id] = sum(
-                assignments[user_id][date_obj][call_type]
-                for date_obj in dates
-                for call_type in call_types
-            )
+            user_avail = user_availabilities.get(user_id)
+            fte = user_avail.fte if user_avail else None
+            equivalence_classes[(fte, blocked_ords.get(user_id, frozenset()))].append(user_id)
+        for class_users in equivalence_classes.values():
+            for user1, user2 in zip(class_users, class_users[1:]):
+                model.Add(total_assignments_per_user[user1] >= total_assignments_per_user[user2])
         
         # Add penalty for uneven distribution
-        max_assignments = model.NewIntVar(0, len(dates) * len(call_types), 'max_assignments')
-        min_assignments = model.NewIntVar(0, len(dates) * len(call_types), 'min_assignments')
+        # A user takes at most one call per day, and the least-loaded user
+        # cannot exceed the average of the D * C slots spread over U users
+        max_bound = D
+        min_bound = min(D, (D * C) // U)
+        max_assignments = model.NewIntVar(0, max_bound, 'max_assignments')
+        min_assignments = model.NewIntVar(0, min_bound, 'min_assignments')
         
-        for user_id in eligible_users:
-            model.AddMaxEquality(max_assignments, [total_assignments_per_user[uid] for uid in eligible_users])
-            model.AddMinEquality(min_assignments, [total_assignments_per_user[uid] for uid in eligible_users])
+        user_totals = [total_assignments_per_user[uid] for uid in eligible_users]
+        model.AddMaxEquality(max_assignments, user_totals)
+        model.AddMinEquality(min_assignments, user_totals)
         
-        fairness_penalty = model.NewIntVar(0, len(dates) * len(call_types), 'fairness_penalty')
+        fairness_penalty = model.NewIntVar(0, max_bound, 'fairness_penalty')
         model.Add(fairness_penalty == max_assignments - min_assignments)
         
         # Minimize unfairness
         model.Minimize(fairness_penalty)
         
+        # Warm start from a greedy round-robin schedule
+        self._add_round_robin_hint(model, assignments, dates, call_types,
+                                   eligible_users, constraints, max_calls, weekend_pairs)
+        
         # Solve the model
         solver = cp_model.CpSolver()
         solver.parameters.max_time_in_seconds = 300.0  # 5 minute timeout
+        solver.parameters.num_workers = os.cpu_count() or 8
+        solver.parameters.log_search_progress = self.debug_solver
+        solver.parameters.linearization_level = constraints.linearization_level
+        solver.parameters.cp_model_probing_level = constraints.cp_model_probing_level
+        solver.parameters.symmetry_level = constraints.symmetry_level
+        solver.parameters.optimize_with_core = constraints.optimize_with_core
+        solver.parameters.relative_gap_limit = constraints.relative_gap_limit
+        solver.parameters.absolute_gap_limit = constraints.absolute_gap_limit
+        solver.parameters.repair_hint = True
+        if self.debug_solver:
+            solver.parameters.log_to_stdout = True
+            self.solver_log = []
+            solver.log_callback = self.solver_log.append
         
-        print("Starting optimization...")
+        logger.info("Starting optimization...")
         status = solver.Solve(model)
         solve_time = solver.WallTime()
         
         # Process results
         if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-            print(f"Solution found in {solve_time:.2f} seconds")
+            logger.info("Solution found in %.2f seconds", solve_time)
             
             # Extract assignments
             result_assignments = []
             assignment_stats = defaultdict(int)
             
-            for user_id in eligible_users:
-                for date_obj in dates:
-                    for call_type in call_types:
-                        if solver.Value(assignments[user_id][date_obj][call_type]) == 1:
-                            # Get user name
-                            user_name = self._get_user_name(user_id)
-                            
-                            result_assignments.append({
-                                'date': date_obj.strftime('%Y-%m-%d'),
-                                'user_id': user_id,
-                                'user_name': user_name,
-                                'call_type': call_type,
-                                'call_type_id': call_type_mapping.get(call_type, 0),
-                                'weekday': date_obj.strftime('%A')
-                            })
-                            assignment_stats[user_id] += 1
+            for i, var in enumerate(assignments):
+                if not isinstance(var, int) and solver.Value(var) == 1:
+                    u, rest = divmod(i, D * C)
+                    d, c = divmod(rest, C)
+                    user_id = eligible_users[u]
+                    date_obj = dates[d]
+                    call_type = call_types[c]
+                    
+                    # Get user name
+                    user_name = self._get_user_name(user_id)
+                    
+                    result_assignments.append({
+                        'date': date_obj.strftime('%Y-%m-%d'),
+                        'user_id': user_id,
+                        'user_name': user_name,
+                        'call_type': call_type,
+                        'call_type_id': call_type_mapping.get(call_type, 0),
+                        'weekday': date_obj.strftime('%A')
+                    })
+                    assignment_stats[user_id] += 1
             
             # Generate statistics
             statistics = {
@@ -211,6 +336,9 @@ class CallScheduleOptimizer:
                 'date_range_days': len(dates),
                 'call_types_scheduled': call_types,
                 'fairness_score': solver.Value(fairness_penalty) if status == cp_model.OPTIMAL else None,
+                # With the gap limits, OPTIMAL may mean "within the gap of this
+                # bound"; fairness_score == fairness_bound is a proven optimum
+                'fairness_bound': solver.BestObjectiveBound(),
                 'solve_status': 'OPTIMAL' if status == cp_model.OPTIMAL else 'FEASIBLE'
             }
             
@@ -224,7 +352,7 @@ class CallScheduleOptimizer:
             
         else:
             # No solution found
-            print(f"No solution found. Status: {solver.StatusName(status)}")
+            logger.warning("No solution found. Status: %s", solver.StatusName(status))
             return ScheduleResult(
                 success=False,
                 assignments=[],
@@ -235,53 +363,74 @@ class CallScheduleOptimizer:
     
     def _get_eligible_users(self) -> List[int]:
         """Get list of eligible user IDs for call scheduling"""
+        cached = self._eligible_users_cache
+        if cached and time.monotonic() - cached[0] < self._lookup_ttl:
+            return list(cached[1])
+        
         try:
             # Get only active users (includeInactive=False is the default)
             all_users = self.api_client.get_user_roster(include_inactive=False)
             eligible_users = []
             
-            print("Filtering for active physicians with call credentials...")
+            logger.info("Filtering for active physicians with call credentials...")
             
-            for user in all_users:
-                # Check if user is a physician using the coregroup field
-                if user.get('coregroup', '').lower() == 'physician':
-                    user_id = int(user['userid'])
-                    user_name = f"{user.get('fname', '')} {user.get('lname', '')}"
-                    
-                    # Check if they have call credentials
+            # Check if user is a physician using the coregroup field
+            physicians = [user for user in all_users
+                          if user.get('coregroup', '').lower() == 'physician']
+            
+            # Prefer a single bulk membership request over one per physician
+            groups_by_user = self.api_client.get_groups_by_user()
+            
+            def check(user) -> bool:
+                """Check if a physician has any call credentials"""
+                if groups_by_user:
+                    groups = groups_by_user.get(user['userid'], [])
+                else:
                     try:
                         response = self.api_client._make_request(
                             'GET', 
                             '/External/get_users_userGroups',
-                            params={'userId': user_id}
+                            params={'userId': user['userid']}
                         )
-                        
-                        if response.get('success'):
-                            groups = response.get('groups', [])
-                            
-                            # Check if they have any call credentials
-                            has_call_creds = any(
-                                'cred call:' in group.get('groupName', '').lower()
-                                for group in groups
-                            )
-                            
-                            if has_call_creds:
-                                eligible_users.append(user_id)
-                                print(f"  Added: {user_name} (ID: {user_id})")
-                            
                     except Exception as e:
-                        print(f"  Error checking credentials for {user_name}: {e}")
-                        continue
+                        logger.warning("Error checking credentials for %s %s: %s",
+                                       user.get('fname', ''), user.get('lname', ''), e)
+                        return False
+                    
+                    if not response.get('success'):
+                        return False
+                    groups = response.get('groups', [])
+                
+                return any(
+                    'cred call:' in group.get('groupName', '').lower()
+                    for group in groups
+                )
             
-            print(f"Found {len(eligible_users)} eligible physicians")
-            return eligible_users
+            # Without bulk memberships each check is a request; run them concurrently
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = list(executor.map(check, physicians))
             
-        except Exception as e:
-            print(f"Error getting eligible users: {e}")
+            for user, has_call_creds in zip(physicians, results):
+                if has_call_creds:
+                    eligible_users.append(user['userid'])
+                    logger.debug("  Added: %s %s (ID: %s)",
+                                 user.get('fname', ''), user.get('lname', ''), user['userid'])
+            
+            logger.info("Found %d eligible physicians", len(eligible_users))
+            if eligible_users:
+                self._eligible_users_cache = (time.monotonic(), eligible_users)
+            return list(eligible_users)
+            
+        except Exception:
+            logger.exception("Error getting eligible users")
             return []
     
     def _get_call_type_mapping(self, start_date: str, end_date: str) -> Dict[str, int]:
         """Get mapping of call type names to IDs"""
+        cached = self._call_type_mapping_cache.get((start_date, end_date))
+        if cached and time.monotonic() - cached[0] < self._lookup_ttl:
+            return dict(cached[1])
+        
         try:
             assign_codes = self.api_client.get_assign_codes_in_range(
                 [self.CALL_SCHEDULE_ID], start_date, end_date
@@ -294,10 +443,12 @@ class CallScheduleOptimizer:
                     code_id = int(code_info[1])
                     mapping[name] = code_id
             
-            return mapping
+            if mapping:
+                self._call_type_mapping_cache[(start_date, end_date)] = (time.monotonic(), mapping)
+            return dict(mapping)
             
-        except Exception as e:
-            print(f"Error getting call type mapping: {e}")
+        except Exception:
+            logger.exception("Error getting call type mapping")
             return {}
     
     def _generate_date_range(self, start_date: str, end_date: str) -> List[date]:
@@ -313,57 +464,76 @@ class CallScheduleOptimizer:
         
         return dates
     
-    def _add_weekend_sandwich_constraints(self, model, assignments, dates, call_types, eligible_users):
-        """Add weekend sandwich rule constraints"""
-        date_to_index = {d: i for i, d in enumerate(dates)}
+    def _blocked_date_ordinals(self, user_availabilities) -> Dict[int, frozenset]:
+        """Map each user ID to the ordinals of their vacation and no-call dates"""
+        return {
+            user_id: frozenset(
+                date_obj.toordinal()
+                for date_obj in chain(user_avail.vacation_dates, user_avail.no_call_dates)
+            )
+            for user_id, user_avail in user_availabilities.items()
+        }
+    
+    def _weekend_pair_slots(self, dates, call_types) -> List[Tuple[int, int, int, int]]:
+        """
+        Resolve the weekend sandwich rules that apply within the date range
         
-        for i, date_obj in enumerate(dates):
-            weekday = date_obj.weekday()  # 0=Monday, 4=Friday, 5=Saturday, 6=Sunday
-            
-            # Friday rules (if Friday and not last day)
-            if weekday == 4 and i < len(dates) - 2:  # Friday
-                saturday = dates[i + 1] if i + 1 < len(dates) else None
-                sunday = dates[i + 2] if i + 2 < len(dates) else None
-                
-                if saturday and sunday:
-                    for user_id in eligible_users:
-                        # Apply weekend sandwich rules using the rules engine
-                        friday_assignments = [assignments[user_id][date_obj][ct] for ct in call_types]
-                        
-                        for call_type in call_types:
-                            friday_var = assignments[user_id][date_obj][call_type]
-                            
-                            # Get weekend assignments for this call type
-                            weekend_call_type = self.weekend_rules.get_weekend_assignment(call_type, 'friday')
-                            if weekend_call_type and weekend_call_type in call_types:
-                                if 'saturday' in weekend_call_type.lower():
-                                    saturday_var = assignments[user_id][saturday][weekend_call_type]
-                                    model.AddImplication(friday_var, saturday_var)
-                                elif 'sunday' in weekend_call_type.lower():
-                                    sunday_var = assignments[user_id][sunday][weekend_call_type]
-                                    model.AddImplication(friday_var, sunday_var)
+        Args:
+            dates: Dates being scheduled
+            call_types: Call types being scheduled
             
-            # Saturday rules
-            if weekday == 5 and i < len(dates) - 1:  # Saturday
-                sunday = dates[i + 1] if i + 1 < len(dates) else None
-                
-                if sunday:
-                    for user_id in eligible_users:
-                        for call_type in call_types:
-                            saturday_var = assignments[user_id][date_obj][call_type]
-                            
-                            # Get Sunday assignment for this Saturday call type
-                            sunday_call_type = self.weekend_rules.get_weekend_assignment(call_type, 'saturday')
-                            if sunday_call_type and sunday_call_type in call_types:
-                                sunday_var = assignments[user_id][sunday][sunday_call_type]
-                                model.AddImplication(saturday_var, sunday_var)
+        Returns:
+            List of (trigger day, trigger call, weekend day, weekend call)
+            index tuples into dates and call_types
+        """
+        D = len(dates)
+        call_type_index = {ct: c for c, ct in enumerate(call_types)}
+        
+        # Weekend rules depend only on (call type, trigger day), so resolve
+        # them once into (trigger index, day offset, result index) triples
+        # keyed by the weekday of the trigger
+        pairs_by_weekday = {4: [], 5: []}  # Friday, Saturday
+        for c, call_type in enumerate(call_types):
+            for weekday, trigger_day in ((4, 'friday'), (5, 'saturday')):
+                for result_day, weekend_call_type in self.weekend_rules.get_all_weekend_pairs(
+                        call_type, trigger_day):
+                    if weekend_call_type in call_type_index:
+                        pairs_by_weekday[weekday].append((
+                            c, _RESULT_DAY_WEEKDAY[result_day] - weekday,
+                            call_type_index[weekend_call_type]
+                        ))
+        
+        pairs = []
+        for i, date_obj in enumerate(dates):
+            # Skip pairs whose weekend day falls past the end of the range
+            for c, offset, wc in pairs_by_weekday.get(date_obj.weekday(), ()):
+                if i + offset < D:
+                    pairs.append((i, c, i + offset, wc))
+        return pairs
+    
+    def _add_weekend_sandwich_constraints(self, model, assignments, D, C, eligible_users,
+                                          weekend_pairs):
+        """Add weekend sandwich rule constraints"""
+        # Every slot is covered exactly once, so "trigger implies result"
+        # for every user is the same as the two slots sharing a user; post
+        # it as an equality, which propagates in both directions.
+        for i, c, j, wc in weekend_pairs:
+            for u in range(len(eligible_users)):
+                _add_equality(model, assignments[(u * D + i) * C + c],
+                              assignments[(u * D + j) * C + wc])
     
-    def _add_fte_based_constraints(self, model, assignments, dates, call_types, 
+    def _add_fte_based_constraints(self, model, total_assignments_per_user, dates, call_types, 
                                   eligible_users, user_availabilities, constraints):
-        """Add FTE-based maximum calls constraints"""
+        """
+        Add FTE-based maximum calls constraints
+        
+        Returns:
+            Dictionary of user index to maximum number of calls
+        """
         period_days = len(dates)
+        max_calls = {}
         
-        for user_id in eligible_users:
+        for u, user_id in enumerate(eligible_users):
             user_avail = user_availabilities.get(user_id)
             if user_avail:
                 # Calculate max calls for this user based on FTE
@@ -372,23 +542,70 @@ class CallScheduleOptimizer:
                 max_calls_for_user = int(avg_calls_per_user * user_avail.fte * 1.2)  # 20% buffer
                 
                 # Add constraint
-                total_assignments = sum(
-                    assignments[user_id][date_obj][call_type]
-                    for date_obj in dates
-                    for call_type in call_types
-                )
-                model.Add(total_assignments <= max_calls_for_user)
+                model.Add(total_assignments_per_user[user_id] <= max_calls_for_user)
+                max_calls[u] = max_calls_for_user
+        
+        return max_calls
+    
+    def _add_round_robin_hint(self, model, assignments, dates, call_types,
+                              eligible_users, constraints, max_calls, weekend_pairs):
+        """Hint the solver with a round-robin assignment of users to call slots"""
+        U, D, C = len(eligible_users), len(dates), len(call_types)
+        k = constraints.min_days_between_calls
+        last_call_day = [-k - 1] * U
+        remaining = [max_calls.get(u, D) for u in range(U)]
+        hinted = set()
+        next_user = 0
+        
+        # The user hinted for a sandwich trigger also takes its weekend slot
+        weekend_of = {(i, c): (j, wc) for i, c, j, wc in weekend_pairs}
+        taken = set()
+        busy = defaultdict(set)  # day -> users hinted on it
+        
+        def blocked(u, d, c):
+            return isinstance(assignments[(u * D + d) * C + c], int)
+        
+        for d in range(D):
+            for c in range(C):
+                if (d, c) in taken:
+                    continue
+                pair = weekend_of.get((d, c))
+                if pair in taken:
+                    pair = None
+                
+                # Prefer the next user in turn who is free today, under their
+                # FTE cap and rested for k days; fall back to ignoring rest
+                chosen = None
+                for rested_only in (True, False):
+                    for step in range(U):
+                        u = (next_user + step) % U
+                        if (u in busy[d] or remaining[u] <= 0 or blocked(u, d, c)
+                                or (rested_only and d - last_call_day[u] <= k)):
+                            continue
+                        if pair and (u in busy[pair[0]] or remaining[u] < 2
+                                     or blocked(u, *pair)):
+                            continue
+                        chosen = u
+                        break
+                    if chosen is not None:
+                        break
+                
+                if chosen is not None:
+                    for slot_d, slot_c in ((d, c), pair) if pair else ((d, c),):
+                        busy[slot_d].add(chosen)
+                        remaining[chosen] -= 1
+                        last_call_day[chosen] = max(last_call_day[chosen], slot_d)
+                        taken.add((slot_d, slot_c))
+                        hinted.add((chosen * D + slot_d) * C + slot_c)
+                    next_user = (chosen + 1) % U
+        
+        for i, var in enumerate(assignments):
+            if not isinstance(var, int):
+                model.AddHint(var, 1 if i in hinted else 0)
     
     def _get_user_name(self, user_id: int) -> str:
         """Get user name from ID"""
-        try:
-            users = self.api_client.get_user_roster()
-            for user in users:
-                if int(user['userid']) == user_id:
-                    return f"{user.get('fname', '')} {user.get('lname', '')}"
-            return f"User {user_id}"
-        except:
-            return f"User {user_id}"
+        return self._name_cache.get(user_id, f"User {user_id}")
 
 
 # Usage example and testing function
@@ -417,12 +634,9 @@ def test_optimizer():
         print(f"Solve time: {result.solve_time_seconds:.2f} seconds")
         
         # Print assignments by date
-        assignments_by_date = {}
+        assignments_by_date = defaultdict(list)
         for assignment in result.assignments:
-            date_str = assignment['date']
-            if date_str not in assignments_by_date:
-                assignments_by_date[date_str] = []
-            assignments_by_date[date_str].append(assignment)
+            assignments_by_date[assignment['date']].append(assignment)
         
         print("\nSchedule:")
         for date_str in sorted(assignments_by_date.keys()):
@@ -444,5 +658,7 @@ def test_optimizer():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    
     # Run test
     test_optimizer()
\ No newline at end of file
@@ -3,13 +3,27 @@ Constraint validation system for call scheduling
 Handles availability conflicts, workload limits, and scheduling rules
 """
 
-from datetime import date, timedelta
-from typing import Dict, List, Set, Tuple, Optional
+from datetime import date
+from typing import AbstractSet, Dict, List, Tuple, Optional
 from dataclasses import dataclass, field
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from src.api_client import SpinSchedulesAPIClient
 
+# Assignment rows repeat the same few date strings across schedules and
+# users, so parse each one only once
+_DATE_CACHE: Dict[str, date] = {}
 
-@dataclass
+
+def _parse_date(value: str) -> date:
+    """Parse a YYYY-MM-DD string, reusing earlier results"""
+    parsed = _DATE_CACHE.get(value)
+    if parsed is None:
+        parsed = _DATE_CACHE[value] = date.fromisoformat(value)
+    return parsed
+
+
+@dataclass(slots=True)
 class SchedulingConstraints:
     """Configuration for scheduling constraints"""
     min_days_between_calls: int = 2
@@ -18,21 +32,74 @@ class SchedulingConstraints:
     enforce_weekend_rules: bool = True
     allow_holiday_assignments: bool = True
     fairness_weight: float = 1.0
+    
+    # CP-SAT search tuning
+    linearization_level: int = 1  # 0-2
+    cp_model_probing_level: int = 2  # 0-3
+    symmetry_level: int = 2  # 0-2
+    optimize_with_core: bool = False
+    relative_gap_limit: float = 0.05  # stop once within 5% of the best bound
+    absolute_gap_limit: float = 1.0  # or within one call of it
+    use_no_overlap_spacing: bool = False  # add NoOverlap alongside the min-days windows
 
 
-@dataclass
+@dataclass(slots=True)
 class UserAvailability:
-    """Availability information for a user"""
+    """
+    Availability information for a user
+    
+    The three date sets are read-only once the mask is built:
+    build_availability_mask freezes them into frozensets (load_user_availabilities
+    builds them frozen). To change a user's availability, assign new sets
+    and call build_availability_mask again.
+    """
     user_id: int
     user_name: str
     fte: float = 1.0
-    vacation_dates: Set[date] = field(default_factory=set)
-    no_call_dates: Set[date] = field(default_factory=set)
-    part_time_dates: Set[date] = field(default_factory=set)
+    vacation_dates: AbstractSet[date] = field(default_factory=set)
+    no_call_dates: AbstractSet[date] = field(default_factory=set)
+    part_time_dates: AbstractSet[date] = field(default_factory=set)
     existing_assignments: Dict[date, str] = field(default_factory=dict)
     
+    # Bit i of availability_mask is set when the user is unavailable on the
+    # day availability_base + i; built by build_availability_mask, which also
+    # freezes the three date sets above so the mask cannot go stale
+    availability_base: Optional[int] = None
+    availability_days: int = 0
+    availability_mask: int = 0
+    
+    def build_availability_mask(self, start: date, days: int):
+        """
+        Pack the vacation, no-call and part-time dates into a bitmask
+        
+        The date sets become frozensets, so adding a date afterwards raises
+        instead of being silently ignored by is_available. Call this again
+        with new sets to change a user's availability.
+        
+        Args:
+            start: First day covered by the mask
+            days: Number of days covered by the mask
+        """
+        self.vacation_dates = frozenset(self.vacation_dates)
+        self.no_call_dates = frozenset(self.no_call_dates)
+        self.part_time_dates = frozenset(self.part_time_dates)
+        
+        base = start.toordinal()
+        mask = 0
+        for date_obj in self.vacation_dates | self.no_call_dates | self.part_time_dates:
+            offset = date_obj.toordinal() - base
+            if 0 <= offset < days:
+                mask |= 1 << offset
+        self.availability_base = base
+        self.availability_days = days
+        self.availability_mask = mask
+    
     def is_available(self, date_obj: date) -> bool:
         """Check if user is available on a specific date"""
+        if self.availability_base is not None:
+            offset = date_obj.toordinal() - self.availability_base
+            if 0 <= offset < self.availability_days:
+                return not (self.availability_mask >> offset) & 1
         return (date_obj not in self.vacation_dates and 
                 date_obj not in self.no_call_dates and
                 date_obj not in self.part_time_dates)
@@ -49,6 +116,8 @@ class ConstraintValidator:
         self.VACATION_SCHEDULE_ID = 384
         self.NO_CALL_SCHEDULE_ID = 385
         self.PART_TIME_SCHEDULE_ID = 386
+        
+        self._name_map: Dict[int, str] = {}
     
     def load_user_availabilities(self, user_ids: List[int], 
                                 start_date: str, end_date: str) -> Dict[int, UserAvailability]:
@@ -67,66 +136,87 @@ class ConstraintValidator:
         
         print(f"Loading availability data for {len(user_ids)} users...")
         
+        # Look up user names from a single roster fetch
+        try:
+            self._name_map = {
+                user['userid']: f"{user.get('fname', '')} {user.get('lname', '')}".strip()
+                for user in self.api_client.get_user_roster()
+            }
+        except Exception as e:
+            print(f"Warning: Could not load user names: {e}")
+            self._name_map = {}
+        
+        start = date.fromisoformat(start_date)
+        period_days = (date.fromisoformat(end_date) - start).days + 1
+        
+        # Fetch each schedule once for the whole range and bucket by user
+        vacation_by_user = self._assignments_by_user(
+            self.VACATION_SCHEDULE_ID, start_date, end_date, 'vacation data')
+        no_call_by_user = self._assignments_by_user(
+            self.NO_CALL_SCHEDULE_ID, start_date, end_date, 'no-call data')
+        part_time_by_user = self._assignments_by_user(
+            self.PART_TIME_SCHEDULE_ID, start_date, end_date, 'part-time data')
+        call_by_user = self._assignments_by_user(
+            self.CALL_SCHEDULE_ID, start_date, end_date, 'existing assignments')
+        
+        # FTE lookups are one request per user, so overlap their round trips
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            ftes = dict(zip(user_ids, executor.map(self._get_user_fte, user_ids)))
+        
         for user_id in user_ids:
             user_avail = UserAvailability(
                 user_id=user_id,
                 user_name=self._get_user_name(user_id),
-                fte=self._get_user_fte(user_id)
-            )
-            
-            # Load vacation dates (schedule 384)
-            try:
-                vacation_assignments = self.api_client.get_assignments_by_schedule(
-                    [self.VACATION_SCHEDULE_ID], start_date, end_date
-                )
-                for assignment in vacation_assignments:
-                    if int(assignment['uId']) == user_id:
-                        vacation_date = date.fromisoformat(assignment['date'])
-                        user_avail.vacation_dates.add(vacation_date)
-            except Exception as e:
-                print(f"Warning: Could not load vacation data for user {user_id}: {e}")
-            
-            # Load no-call request dates (schedule 385)
-            try:
-                no_call_assignments = self.api_client.get_assignments_by_schedule(
-                    [self.NO_CALL_SCHEDULE_ID], start_date, end_date
-                )
-                for assignment in no_call_assignments:
-                    if int(assignment['uId']) == user_id:
-                        no_call_date = date.fromisoformat(assignment['date'])
-                        user_avail.no_call_dates.add(no_call_date)
-            except Exception as e:
-                print(f"Warning: Could not load no-call data for user {user_id}: {e}")
-            
-            # Load part-time dates (schedule 386)
-            try:
-                part_time_assignments = self.api_client.get_assignments_by_schedule(
-                    [self.PART_TIME_SCHEDULE_ID], start_date, end_date
+                fte=ftes[user_id],
+                # Vacation dates (schedule 384)
+                vacation_dates=frozenset(
+                    _parse_date(assignment['date']) for assignment in vacation_by_user.get(user_id, ())
+                ),
+                # No-call request dates (schedule 385)
+                no_call_dates=frozenset(
+                    _parse_date(assignment['date']) for assignment in no_call_by_user.get(user_id, ())
+                ),
+                # Part-time dates (schedule 386)
+                part_time_dates=frozenset(
+                    _parse_date(assignment['date']) for assignment in part_time_by_user.get(user_id, ())
                 )
-                for assignment in part_time_assignments:
-                    if int(assignment['uId']) == user_id:
-                        part_time_date = date.fromisoformat(assignment['date'])
-                        user_avail.part_time_dates.add(part_time_date)
-            except Exception as e:
-                print(f"Warning: Could not load part-time data for user {user_id}: {e}")
+            )
             
-            # Load existing call assignments (schedule 383)
-            try:
-                call_assignments = self.api_client.get_assignments_by_schedule(
-                    [self.CALL_SCHEDULE_ID], start_date, end_date
-                )
-                for assignment in call_assignments:
-                    if int(assignment['uId']) == user_id:
-                        call_date = date.fromisoformat(assignment['date'])
-                        call_type = assignment.get('aName', 'Unknown')
-                        user_avail.existing_assignments[call_date] = call_type
-            except Exception as e:
-                print(f"Warning: Could not load existing assignments for user {user_id}: {e}")
+            # Existing call assignments (schedule 383)
+            for assignment in call_by_user.get(user_id, ()):
+                call_date = _parse_date(assignment['date'])
+                user_avail.existing_assignments[call_date] = assignment.get('aName', 'Unknown')
             
+            user_avail.build_availability_mask(start, period_days)
             user_availabilities[user_id] = user_avail
         
         return user_availabilities
     
+    def _assignments_by_user(self, schedule_id: int, start_date: str, end_date: str,
+                             description: str) -> Dict[int, List[Dict]]:
+        """
+        Fetch a schedule's assignments for a date range, grouped by user
+        
+        Args:
+            schedule_id: Schedule to fetch
+            start_date: Start date (YYYY-MM-DD)
+            end_date: End date (YYYY-MM-DD)
+            description: What the schedule holds, for the warning on failure
+            
+        Returns:
+            Dictionary mapping user_id to that user's assignments
+        """
+        by_user = defaultdict(list)
+        try:
+            assignments = self.api_client.get_assignments_by_schedule(
+                [schedule_id], start_date, end_date
+            )
+            for assignment in assignments:
+                by_user[int(assignment['uId'])].append(assignment)
+        except Exception as e:
+            print(f"Warning: Could not load {description}: {e}")
+        return by_user
+    
     def _get_user_fte(self, user_id: int) -> float:
         """Get FTE value for a user"""
         try:
@@ -155,20 +245,11 @@ class ConstraintValidator:
     
     def _get_user_name(self, user_id: int) -> str:
         """Get user name from ID"""
-        try:
-            users = self.api_client.get_user_roster()
-            for user in users:
-                if int(user['userid']) == user_id:
-                    fname = user.get('fname', '')
-                    lname = user.get('lname', '')
-                    return f"{fname} {lname}".strip()
-            return f"User {user_id}"
-        except:
-            return f"User {user_id}"
+        return self._name_map.get(user_id, f"User {user_id}")
     
     def validate_assignment(self, user_id: int, date_obj: date, call_type: str,
                            user_availabilities: Dict[int, UserAvailability],
-                           existing_assignments: Dict[date, Dict[int, str]],
+                           existing_assignments: Dict[int, Dict[int, str]],
                            constraints: SchedulingConstraints) -> List[str]:
         """
         Validate if an assignment is allowed
@@ -178,7 +259,8 @@ class ConstraintValidator:
             date_obj: Date of assignment
             call_type: Type of call being assigned
             user_availabilities: User availability data
-            existing_assignments: Dictionary of existing assignments
+            existing_assignments: Existing assignments keyed by date ordinal, then
+                user ID (see index_assignments_by_ordinal)
             constraints: Scheduling constraints
             
         Returns:
@@ -201,36 +283,40 @@ class ConstraintValidator:
                 errors.append(f"User {user_avail.user_name} is part-time on {date_obj}")
         
         # Check minimum days between calls
-        if constraints.min_days_between_calls > 0:
-            for i in range(1, constraints.min_days_between_calls + 1):
-                # Check previous days
-                prev_date = date_obj - timedelta(days=i)
-                if (prev_date in existing_assignments and 
-                    user_id in existing_assignments[prev_date]):
+        min_days = constraints.min_days_between_calls
+        date_ord = date_obj.toordinal()
+        for i in range(1, min_days + 1):
+            # Check previous days, then future days
+            for other_ord in (date_ord - i, date_ord + i):
+                if user_id in existing_assignments.get(other_ord, ()):
                     errors.append(
-                        f"User {user_avail.user_name} has assignment on {prev_date}, "
-                        f"violates minimum {constraints.min_days_between_calls} days between calls"
-                    )
-                
-                # Check future days
-                future_date = date_obj + timedelta(days=i)
-                if (future_date in existing_assignments and 
-                    user_id in existing_assignments[future_date]):
-                    errors.append(
-                        f"User {user_avail.user_name} has assignment on {future_date}, "
-                        f"violates minimum {constraints.min_days_between_calls} days between calls"
+                        f"User {user_avail.user_name} has assignment on {date.fromordinal(other_ord)}, "
+                        f"violates minimum {min_days} days between calls"
                     )
         
         # Check if user already has assignment on this date
-        if (date_obj in existing_assignments and 
-            user_id in existing_assignments[date_obj]):
-            existing_call = existing_assignments[date_obj][user_id]
+        existing_call = existing_assignments.get(date_ord, {}).get(user_id)
+        if existing_call is not None:
             errors.append(
                 f"User {user_avail.user_name} already assigned to {existing_call} on {date_obj}"
             )
         
         return errors
     
+    @staticmethod
+    def index_assignments_by_ordinal(
+            existing_assignments: Dict[date, Dict[int, str]]) -> Dict[int, Dict[int, str]]:
+        """
+        Re-key existing assignments by date ordinal for validate_assignment
+        
+        Args:
+            existing_assignments: Dictionary of date to {user_id: call_type}
+            
+        Returns:
+            The same assignments keyed by date.toordinal()
+        """
+        return {date_obj.toordinal(): calls for date_obj, calls in existing_assignments.items()}
+    
     def calculate_max_calls_for_period(self, user_id: int, period_days: int,
                                       total_call_slots: int, total_users: int,
                                       user_availabilities: Dict[int, UserAvailability]) -> int:
@@ -3,12 +3,27 @@ Weekend sandwich rules engine for call scheduling
 Handles complex pairing logic for weekend call assignments
 """
 
-from datetime import date, timedelta
+from datetime import date
 from typing import Dict, List, Tuple, Optional, Set
 from dataclasses import dataclass
+from collections import defaultdict
+import functools
 
+# Indexed by date.weekday() (0=Monday, 6=Sunday)
+_WEEKEND = (False, False, False, False, False, True, True)
+_WEEKEND_DAY_NAMES = ('', '', '', '', '', 'saturday', 'sunday')
 
-@dataclass
+# Days from a weekend assignment back to its trigger, keyed by
+# (trigger day, weekday of the assignment)
+_TRIGGER_OFFSETS = {
+    ('friday', 5): -1,
+    ('friday', 6): -2,
+    ('saturday', 5): -2,
+    ('saturday', 6): -1,
+}
+
+
+@dataclass(slots=True, frozen=True)
 class WeekendRule:
     """Represents a weekend sandwich rule"""
     trigger_call: str  # The call that triggers the rule
@@ -21,7 +36,40 @@ class WeekendRulesEngine:
     """Manages weekend sandwich rules for call scheduling"""
     
     def __init__(self):
-        self.rules = self._initialize_rules()
+        # Rules and every table derived from them are tuples so a single
+        # engine can be shared safely (see get_weekend_rules_engine)
+        self.rules: Tuple[WeekendRule, ...] = tuple(self._initialize_rules())
+        
+        # Index rules by (call, day) on each side so lookups skip the scan
+        by_trigger = defaultdict(list)
+        by_result = defaultdict(list)
+        for rule in self.rules:
+            by_trigger[(rule.trigger_call, rule.trigger_day)].append(rule)
+            by_result[(rule.result_call, rule.result_day)].append(rule)
+        self._by_trigger: Dict[Tuple[str, str], Tuple[WeekendRule, ...]] = {
+            key: tuple(rules) for key, rules in by_trigger.items()
+        }
+        self._by_result: Dict[Tuple[str, str], Tuple[WeekendRule, ...]] = {
+            key: tuple(rules) for key, rules in by_result.items()
+        }
+        
+        # Precomputed answers for the (call, trigger day) queries
+        self._weekend_assignment: Dict[Tuple[str, str], str] = {
+            key: rules[0].result_call for key, rules in self._by_trigger.items()
+        }
+        self._weekend_pairs: Dict[Tuple[str, str], Tuple[Tuple[str, str], ...]] = {
+            key: tuple((rule.result_day, rule.result_call) for rule in rules)
+            for key, rules in self._by_trigger.items()
+        }
+        
+        # For validation: (result call, weekday) -> (ordinal offset back to
+        # the trigger date, trigger call) for each rule producing that call
+        self._triggers_by_result: Dict[Tuple[str, int], Tuple[Tuple[int, str], ...]] = {
+            (call, weekday): tuple((_TRIGGER_OFFSETS[(rule.trigger_day, weekday)], rule.trigger_call)
+                                   for rule in rules)
+            for (call, day), rules in self._by_result.items()
+            for weekday in (5, 6) if _WEEKEND_DAY_NAMES[weekday] == day
+        }
     
     def _initialize_rules(self) -> List[WeekendRule]:
         """Initialize all weekend sandwich rules"""
@@ -85,10 +133,7 @@ class WeekendRulesEngine:
         Returns:
             The call type that should be assigned on the weekend, or None
         """
-        for rule in self.rules:
-            if rule.trigger_call == call_type and rule.trigger_day == day:
-                return rule.result_call
-        return None
+        return self._weekend_assignment.get((call_type, day))
     
     def get_all_weekend_pairs(self, call_type: str, day: str) -> List[Tuple[str, str]]:
         """
@@ -101,11 +146,7 @@ class WeekendRulesEngine:
         Returns:
             List of (day, call_type) pairs for weekend assignments
         """
-        pairs = []
-        for rule in self.rules:
-            if rule.trigger_call == call_type and rule.trigger_day == day:
-                pairs.append((rule.result_day, rule.result_call))
-        return pairs
+        return list(self._weekend_pairs.get((call_type, day), ()))
     
     def validate_weekend_assignment(self, assignments: Dict, date_obj: date, 
                                    user_id: int, call_type: str) -> List[str]:
@@ -113,7 +154,7 @@ class WeekendRulesEngine:
         Validate if a weekend assignment follows the sandwich rules
         
         Args:
-            assignments: Dictionary of existing assignments
+            assignments: Existing assignments keyed by date ordinal, then user ID
             date_obj: Date of the assignment
             user_id: User being assigned
             call_type: Call type being assigned
@@ -122,38 +163,34 @@ class WeekendRulesEngine:
             List of validation errors (empty if valid)
         """
         errors = []
-        weekday = date_obj.weekday()  # 0=Monday, 6=Sunday
+        date_ord = date_obj.toordinal()
+        weekday = (date_ord - 1) % 7  # ordinal 1 is a Monday, so 0=Monday, 6=Sunday
         
-        # Check if this is a weekend assignment that should have a trigger
-        if weekday in [5, 6]:  # Saturday or Sunday
-            day_name = 'saturday' if weekday == 5 else 'sunday'
-            
-            # Look for rules that result in this assignment
-            triggering_rules = [r for r in self.rules 
-                              if r.result_call == call_type and r.result_day == day_name]
-            
-            if triggering_rules:
-                # Check if the user has the triggering assignment
-                found_trigger = False
-                for rule in triggering_rules:
-                    trigger_day_offset = -1 if rule.trigger_day == 'friday' and weekday == 5 else -2
-                    if rule.trigger_day == 'friday' and weekday == 6:
-                        trigger_day_offset = -2
-                    elif rule.trigger_day == 'saturday' and weekday == 6:
-                        trigger_day_offset = -1
-                    
-                    trigger_date = date_obj + timedelta(days=trigger_day_offset)
-                    if (trigger_date in assignments and 
-                        user_id in assignments[trigger_date] and
-                        assignments[trigger_date][user_id] == rule.trigger_call):
-                        found_trigger = True
-                        break
-                
-                if not found_trigger:
-                    trigger_calls = [r.trigger_call for r in triggering_rules]
-                    errors.append(
-                        f"Weekend assignment {call_type} on {day_name} should be "
-                        f"paired with {trigger_calls} assignment"
-                    )
-        
-        return errors
\ No newline at end of file
+        # Only Saturday and Sunday assignments can be the result of a rule
+        if not _WEEKEND[weekday]:
+            return errors
+        
+        # Look for rules that result in this assignment
+        triggers = self._triggers_by_result.get((call_type, weekday))
+        if not triggers:
+            return errors
+        
+        # Check if the user has the triggering assignment
+        for offset, trigger_call in triggers:
+            if assignments.get(date_ord + offset, {}).get(user_id) == trigger_call:
+                return errors
+        
+        day_name = _WEEKEND_DAY_NAMES[weekday]
+        trigger_calls = [trigger_call for _, trigger_call in triggers]
+        errors.append(
+            f"Weekend assignment {call_type} on {day_name} should be "
+            f"paired with {trigger_calls} assignment"
+        )
+        
+        return errors
+
+
+@functools.cache
+def get_weekend_rules_engine() -> WeekendRulesEngine:
+    """Get the shared weekend rules engine, built on first use"""
+    return WeekendRulesEngine()